@@ -0,0 +1,3 @@
+-- Adds the state version used for the /game-status ETag and for optimistic locking on writes.
+-- Run once against databases created before the column existed; works on PostgreSQL and SQLite.
+ALTER TABLE connections_game ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
@@ -13,23 +13,53 @@ Error Handlers:
 """
 
 import os
-from flask import Flask
+import orjson
+from flask import Flask, Response
 from flask_cors import CORS
+from flask_compress import Compress
 from .models.models import db
 from .blueprints.api.routes import api_bp
 from .services.utils import create_response
 
+# Comma-separated allowlist of origins that may call the API, read once at import (default: any origin)
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",")]
+
+# The welcome payload never changes, so it is serialized once
+_WELCOME_BODY = orjson.dumps({"data": {"message": "Welcome to the Connections game API!"}})
+
+# Connection pool for a database server; SQLite keeps SQLAlchemy's defaults for its file or memory pools.
+# Each request holds at most one connection, so the defaults match the 4 threads per Gunicorn worker
+_SERVER_ENGINE_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "4")),  # Connections kept open per process
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "4")),  # Extra connections under bursts
+    "pool_pre_ping": True,  # Replace connections the server dropped instead of failing the request
+    "pool_recycle": 1800,  # Reopen connections after 30 minutes, ahead of server-side idle timeouts
+}
+
 
 def create_app():
     app = Flask(__name__)
-    CORS(app)
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
+    # Only the API routes need CORS headers; the ETag is exposed so clients can revalidate
+    CORS(
+        app,
+        resources={r"/connections/*": {"origins": CORS_ORIGINS, "expose_headers": ["ETag"]}},
+    )
+    # Compress JSON bodies above the threshold, preferring Brotli over gzip
+    app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+    app.config["COMPRESS_MIN_SIZE"] = 512
+    Compress(app)
+    database_url = os.getenv("DATABASE_URL")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    if database_url and not database_url.startswith("sqlite"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _SERVER_ENGINE_OPTIONS
     db.init_app(app)  # Bind the app with the SQLAlchemy instance
+    # Match routes with or without a trailing slash instead of answering with a redirect
+    app.url_map.strict_slashes = False
     app.register_blueprint(api_bp, url_prefix="/connections")
 
     @app.route("/")
     def index():
-        return create_response(data={"message": "Welcome to the Connections game API!"})
+        return Response(_WELCOME_BODY, mimetype="application/json")
 
     @app.errorhandler(404)
     def not_found(error):
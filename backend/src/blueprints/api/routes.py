@@ -17,19 +17,53 @@ Associated Functions:
 - get_all_game_data(): Retrieves data for all game sessions.
 """
 
-from flask import Blueprint, request
+import fastjsonschema
+from flask import Blueprint, Response, request
+from sqlalchemy.orm.exc import StaleDataError
 from ...game.game import (
     create_new_game,
-    get_game_state,
-    get_all_games_data,
-    restart_game,
+    get_state_version,
+    get_game_state_snapshot,
+    get_all_games_json,
+    restart_game as restart_game_session,  # The restart_game view below would shadow this name
     process_guess,
-    validate_id,
 )
-from ...services.utils import parse_and_validate_request, create_response
+from ...services.utils import (
+    parse_and_validate_request,
+    create_response,
+    create_raw_data_response,
+)
 
 api_bp = Blueprint("connections", __name__)
 
+# Reported when a write still conflicts with concurrent changes to the game after retrying
+_CONFLICT_ERROR = "Game was modified concurrently, please retry."
+
+# Payload validators, compiled once at import into straight-line Python functions.
+# They are the only check of the required fields and their types
+_validate_game_id_payload = fastjsonschema.compile(
+    {
+        "type": "object",
+        "required": ["gameId"],
+        "properties": {"gameId": {"type": "string"}},
+    }
+)
+_validate_submit_guess_payload = fastjsonschema.compile(
+    {
+        "type": "object",
+        "required": ["gameId", "guess"],
+        "properties": {
+            "gameId": {"type": "string"},
+            "guess": {
+                "type": "array",
+                "minItems": 4,
+                "maxItems": 4,
+                "items": {"type": "string"},
+            },
+        },
+    }
+)
+
 
 @api_bp.route("/generate-grid", methods=["GET"])
 def generate_grid():
@@ -60,52 +94,82 @@ def submit_guess():
     :return: A JSON response indicating whether the guess was correct or not,
              and relevant game state information.
     """
-    required_fields = ["gameId", "guess"]
-    data, error = parse_and_validate_request(required_fields)
+    data, error = parse_and_validate_request(_validate_submit_guess_payload)
     if error:
         return create_response(error=error, status_code=400)
 
-    # Validate the game id
     game_id = data["gameId"]
-    if not validate_id(game_id):
-        return create_response(error="Invalid game ID.", status_code=404)
     guess = data["guess"]
 
-    # Validate the guess format (must be a list of four words)
-    if not isinstance(guess, list) or len(guess) != 4:
-        return create_response(
-            error="Invalid guess format. A guess should be a list of four words.", status_code=400
-        )
-
-    # Process the guess and update the game state
-    game_state, is_valid, is_correct, is_new = process_guess(game_id, guess)
+    # Process the guess and update the game state; the game is loaded once, so an unknown
+    # ID is reported by process_guess rather than checked with a separate query
+    try:
+        game_state, is_valid, is_correct, is_new = process_guess(game_id, guess)
+    except ValueError:
+        return create_response(error="Invalid game ID.", status_code=404)
+    except StaleDataError:
+        return create_response(error=_CONFLICT_ERROR, status_code=409)
     if not is_valid:
         return create_response(error="Invalid guess.", status_code=400)
 
+    game_state = game_state.to_state()
     game_state.update({"isCorrect": is_correct, "isNewGuess": is_new})
     return create_response(data=game_state)
 
 
-@api_bp.route("/game-status", methods=["POST"])
+@api_bp.route("/game-status", methods=["GET"])
 def game_status():
     """
     Returns the current status of a game, including the grid, mistakes left, and game over flag.
-    Requires gameId in the JSON payload.
+    Requires the gameId query parameter. The response carries a weak ETag; a request whose
+    If-None-Match header matches the current state receives an empty 304 response.
     """
-    required_fields = ["gameId"]
-    data, error = parse_and_validate_request(required_fields)
-    if error:
-        return create_response(error=error, status_code=400)
+    # Conditional requests are only answered with 304 for GET and HEAD, so the ID comes from
+    # the query string rather than a JSON body
+    data = request.args.to_dict()
+    try:
+        _validate_game_id_payload(data)
+    except fastjsonschema.JsonSchemaValueException as e:
+        return create_response(error=f"Invalid request parameters: {e.message}", status_code=400)
 
-    # Validate the game id
     game_id = data["gameId"]
-    if not validate_id(game_id):
+
+    # The version only changes when the state does, so a conditional request is answered
+    # from the version alone and the JSON columns are never read on a match
+    client_etags = _client_etags()
+    if client_etags:
+        version = get_state_version(game_id)
+        if version is None:
+            return create_response(error="Invalid game ID.", status_code=404)
+        matched_etag = client_etags.get(f"{game_id}-{version}")
+        if matched_etag is not None:
+            # A 304 must carry the ETag the client validated against
+            response = Response(status=304)
+            response.set_etag(matched_etag, weak=True)
+            return response
+
+    # Load the game once for both the state and the version behind its ETag
+    snapshot = get_game_state_snapshot(game_id)
+    if snapshot is None:
         return create_response(error="Invalid game ID.", status_code=404)
+    state, version = snapshot
 
-    # Get the game state
-    game = get_game_state(game_id)
+    response, status_code = create_response(data=state)
+    response.set_etag(f"{game_id}-{version}", weak=True)
+    return response, status_code
 
-    return create_response(data=game.to_state())
+
+def _client_etags() -> "dict[str, str]":
+    """
+    Collects the entity tags from the request's If-None-Match header, keyed by game ETag.
+
+    Flask-Compress appends the encoding to the ETag of a compressed response (for example
+    "<id>-<version>:br"), so the suffix is stripped to find the game ETag it was built from.
+    A wildcard (*) is ignored, since it would otherwise match every game.
+
+    :return: A dictionary mapping each game ETag to the entity tag the client sent for it.
+    """
+    return {etag.split(":", 1)[0]: etag for etag in request.if_none_match.as_set(include_weak=True)}
 
 
 @api_bp.route("/restart-game", methods=["POST"])
@@ -114,17 +178,18 @@ def restart_game():
     Restarts the game with a new grid, resetting mistakes left.
     Requires JSON payload with gameId.
     """
-    required_fields = ["gameId"]
-    data, error = parse_and_validate_request(required_fields)
+    data, error = parse_and_validate_request(_validate_game_id_payload)
     if error:
         return create_response(error=error, status_code=400)
 
-    # Validate the game id
+    # Restart the game; an unknown ID is reported by the single load in reset_game
     game_id = data["gameId"]
-    if not validate_id(game_id):
+    try:
+        game = restart_game_session(game_id)
+    except ValueError:
         return create_response(error="Invalid game ID.", status_code=404)
-
-    game = restart_game(game_id)
+    except StaleDataError:
+        return create_response(error=_CONFLICT_ERROR, status_code=409)
 
     return create_response(data=game.to_state())
 
@@ -134,6 +199,7 @@ def get_all_game_data():
     """
     Returns the game statuses of all games in the database.
     """
-    games_data = get_all_games_data()
+    # The database serializes every game in one query; the text is passed through untouched
+    games_json = get_all_games_json()
 
-    return create_response(data={"games": games_data})
+    return create_raw_data_response('{"games":' + games_json + "}")
@@ -1,26 +1,32 @@
 """
 Data Access Layer (DAL) module for the Connections game API.
 
-This module provides the necessary functions to interact with the database. It handles operations such as creating new game sessions, checking for existing games, retrieving game details, and converting data types for compatibility with SQLAlchemy.
+This module provides the necessary functions to interact with the database. It handles operations such as creating new game sessions, retrieving game details, and converting data types for compatibility with SQLAlchemy.
 
 Functions:
 - add_new_game(grid, connections): Adds a new game to the database with the specified grid and connections.
-- check_game_exists(game_id): Checks if a game with the specified ID exists in the database.
-- get_game_from_db(game_id): Retrieves a game from the database using the game ID, ensuring the connections are mutable for tracking changes.
-- update_game_state(game_id, guess, is_correct): Updates the game state based on the result of a guess, adding the guess to previous guesses, decrementing the number of guesses if the guess was incorrect, and updating the guessed status of the connection if the guess was correct.
+- add_new_games(puzzles): Adds several new games to the database in a single transaction.
+- get_game_from_db(game_id, mutable): Retrieves a game from the database using the game ID, optionally wrapping the connections for change tracking.
+- get_game_version(game_id): Retrieves only the state version of a game.
 - check_game_over(game): Evaluates the game's status based on the remaining mistakes and win conditions.
 - all_conditions_for_win_met(game): Checks if all conditions for a win are met in the game.
-- is_guess_correct(game_id, guess): Determines if the guess is correct and valid based on the game's relationship definitions and rules.
+- apply_guess(game_id, guess): Evaluates and records a guess against a single fetch of the game, committing once.
 - reset_game(game_id, grid, connections): Resets the game with a new grid and connections, updating the game state in the database.
-- get_all_games(): Retrieves all game data from the database.
+- get_all_game_states_json(): Serializes the state of every game to JSON inside the database.
 """
 
 import uuid
 import json
+from sqlalchemy import cast, func
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
 from ..models.models import db, ConnectionsGame, GameStatus
 
+# Number of times apply_guess and reset_game attempt their write when concurrent writes conflict
+_WRITE_ATTEMPTS = 2
 
-def add_new_game(grid: "list[str]", connections: "list[dict]") -> str:
+
+def add_new_game(grid: "list[str]", connections: "list[dict]") -> "ConnectionsGame":
     """
     Adds a new game to the database with the specified grid and connections.
     Initializes the game with 4 mistakes allowed, an empty list of previous guesses,
@@ -31,53 +37,58 @@ def add_new_game(grid: "list[str]", connections: "list[dict]") -> str:
         connections (list): A list of dictionaries detailing the connections between words.
 
     Returns:
-        str: The unique identifier of the newly created game.
-    """
-    # Coerce connections into MutableDict
-    mutable_connections = ConnectionsGame.make_connections_mutable(connections)
-    new_game = ConnectionsGame(
-        id=str(uuid.uuid4()),  # Convert UUID to string
-        connections=connections,
-        grid=grid,
-        mistakes_left=4,
-        previous_guesses=[],  # Serialize an empty list to JSON string
-        status=GameStatus.IN_PROGRESS,
-    )
-    db.session.add(new_game)
-    db.session.commit()
-    return new_game.id
+        ConnectionsGame: The newly created game, already populated, so callers need not reload it.
+    """
+    return add_new_games([(grid, connections)])[0]
 
 
-def check_game_exists(game_id: str) -> bool:
+def add_new_games(puzzles: "list[tuple[list[str], list[dict]]]") -> "list[ConnectionsGame]":
     """
-    Determines if a game session with the specified ID is present in the database.
+    Adds several new games to the database in one transaction, each initialized as in add_new_game.
+
+    The IDs are generated client-side, so the rows are flushed as a single multi-row INSERT
+    and committed once, rather than one INSERT and COMMIT per game.
 
     Args:
-        game_id (str): The unique identifier of the game session to check.
+        puzzles (list): A list of (grid, connections) tuples, one per game to create.
 
     Returns:
-        bool: True if the game exists, False otherwise.
+        list: The newly created ConnectionsGame objects, in the same order as the puzzles.
     """
-    return ConnectionsGame.query.filter_by(id=game_id).first() is not None
+    new_games = [
+        ConnectionsGame(
+            id=uuid.uuid4().hex,  # 32-char hex form, skips UUID.__str__ dash formatting
+            connections=connections,
+            grid=grid,
+            mistakes_left=4,
+            previous_guesses=[],  # Serialize an empty list to JSON string
+            status=GameStatus.IN_PROGRESS,
+        )
+        for grid, connections in puzzles
+    ]
+    db.session.add_all(new_games)
+    db.session.commit()
+    return new_games
 
 
-def get_game_from_db(game_id: str) -> "ConnectionsGame | None":
+def get_game_from_db(game_id: str, mutable: bool = False) -> "ConnectionsGame | None":
     """
-    Retrieves a game from the database using the game ID after checking its existence.
+    Retrieves a game from the database using the game ID.
+
+    Connections are left as plain dictionaries by default; the DAL's write paths flag the
+    column as modified themselves, so only callers that mutate connection dictionaries
+    directly need them wrapped.
 
     :param game_id: The ID of the game to retrieve.
-    :return: The Game object if found, with connections converted to MutableDict.
-    :raises ValueError: If no game is found with the provided ID.
+    :param mutable: Whether to convert the connections to MutableDict for change tracking.
+    :return: The Game object if found, otherwise None.
     """
-    # Check if the game with the specified ID exists in the database
-    if not check_game_exists(game_id):
+    # Primary-key lookup through the identity map; a missing game comes back as None
+    game = db.session.get(ConnectionsGame, game_id)
+    if game is None:
         return None  # Return None if the game does not exist
 
-    # Retrieve the game object from the database
-    game = ConnectionsGame.query.filter_by(id=game_id).first()
-
-    # If the game object is found, convert its connections to MutableDict
-    if game:
+    if mutable:
         # Convert each connection dictionary in the list to a MutableDict
         # This allows SQLAlchemy to track changes to the dictionary contents
         game.connections = ConnectionsGame.make_connections_mutable(game.connections)
@@ -86,41 +97,48 @@ def get_game_from_db(game_id: str) -> "ConnectionsGame | None":
     return game
 
 
-def update_game_state(game_id: str, guess: "list[str]", is_correct: bool):
+def get_game_version(game_id: str) -> "int | None":
     """
-    Updates the game state based on the result of a guess, adding the guess to previous guesses,
-    decrementing the number of guesses if the guess was incorrect, and updating the guessed status
-    of the connection if the guess was correct.
+    Retrieves only the state version of a game, without reading its JSON columns.
 
-    :param game_id: The ID of the game session.
-    :param guess: The guess made by the player.
-    :param is_correct: A boolean indicating whether the guess was valid.
+    :param game_id: The ID of the game.
+    :return: The game's version, or None if the game does not exist.
     """
-    game = get_game_from_db(game_id)
+    query = db.select(ConnectionsGame.version).where(ConnectionsGame.id == game_id)
+    return db.session.execute(query).scalar_one_or_none()
+
 
-    # Check if the current guess has already been made
-    if guess in game.previous_guesses:
+def _record_guess(game: "ConnectionsGame", guess: "list[str]", is_correct: bool) -> bool:
+    """
+    Applies a guess to an already loaded game without committing.
+
+    :param game: The game object to update.
+    :param guess: The guess made by the player.
+    :param is_correct: A boolean indicating whether the guess was correct.
+    :return: True if the game state changed, False if the guess had already been made.
+    """
+    # Check if the current guess has already been made, in any word order
+    if game.has_guessed(guess):
         # If the guess has already been made, do not modify the game state
-        return
+        return False
 
     # Add the new guess to the list of previous guesses
-    game.previous_guesses.append(guess)
+    game.add_previous_guess(guess)
 
     # If the guess is incorrect, decrement the number of mistakes left
     if not is_correct:
         game.mistakes_left -= 1
     else:
         # If the guess is correct, update the guessed status of the corresponding connection
-        for connection in game.connections:
-            if set(guess) == set(connection["words"]):
-                connection["guessed"] = True
-                break
+        connection = game.find_connection(guess)
+        if connection is not None:
+            connection["guessed"] = True
+            # Connections are plain dicts, so mark the column dirty explicitly
+            flag_modified(game, "connections")
 
     # Check if the game is over after the update
     check_game_over(game)
-
-    # Save the updated game state to the database
-    db.session.commit()
+    return True
 
 
 def check_game_over(game: "ConnectionsGame"):
@@ -131,7 +149,7 @@ def check_game_over(game: "ConnectionsGame"):
     If all conditions for a win are met, the game status is set to WIN.
     Otherwise, the game remains IN PROGRESS.
 
-    The game status is then committed to the database.
+    The status change is not committed here; the caller owns the transaction and commits once.
 
     :param game: The game object whose status is to be evaluated.
     """
@@ -141,7 +159,6 @@ def check_game_over(game: "ConnectionsGame"):
         game.status = GameStatus.WIN
     else:
         game.status = GameStatus.IN_PROGRESS
-    db.session.commit()
 
 
 def all_conditions_for_win_met(game: "ConnectionsGame") -> bool:
@@ -155,49 +172,73 @@ def all_conditions_for_win_met(game: "ConnectionsGame") -> bool:
     return all(connection["guessed"] for connection in game.connections)
 
 
-def check_guess(game_id: str, guess: "list[str]") -> "tuple[bool, bool]":
+def _evaluate_guess(game: "ConnectionsGame", guess: "list[str]") -> "tuple[bool, bool, bool]":
     """
-    Determines if the guess is correct and valid based on the game's relationship definitions and rules.
+    Evaluates a guess against an already loaded game.
 
-    :param game_id: The ID of the game session where the guess is being made.
+    :param game: The game object the guess is made against.
     :param guess: A list of four words that represent the player's guess.
     :return: A tuple (is_correct, is_valid, is_new) where:
         - is_correct is a boolean indicating if the guess is correct.
         - is_valid is a boolean indicating if the guess is valid.
         - is_new is a boolean indicating if the guess is new.
     """
-
-    game = get_game_from_db(game_id)
-
-    if game is None:
-        raise ValueError("Game not found with the provided game ID.")
-
     # If the game is not in progress, return False for both is_correct and is_valid
     if game.status != GameStatus.IN_PROGRESS:
         return False, False, False
 
     # Check if the guess is valid
-    is_valid = (
-        len(guess) == 4
-        and all(word in game.grid for word in guess)
-        and len(set(guess)) == 4  # Ensure no duplicate words in the guess
-    )
+    # The mask is None for words outside the grid, and its popcount counts the distinct words
+    guess_mask = game.guess_mask(guess) if len(guess) == 4 else None
+    is_valid = guess_mask is not None and bin(guess_mask).count("1") == 4
 
-    # Check if the guess is new
-    is_new = guess not in game.previous_guesses
+    # Check if the guess is new, in any word order
+    is_new = not game.has_guessed(guess)
 
     # Check if the guess is correct
-    is_correct = False
-    if is_valid:
-        connections = game.connections
-        for connection in connections:
-            if set(guess) == set(connection["words"]):
-                is_correct = True
-                break
+    is_correct = is_valid and game.connection_for_mask(guess_mask) is not None
 
     return is_correct, is_valid, is_new
 
 
+def apply_guess(game_id: str, guess: "list[str]") -> "tuple[ConnectionsGame, bool, bool, bool]":
+    """
+    Evaluates a guess and, if it is valid, records it, all against a single fetch of the game.
+
+    Evaluation and recording share the loaded game, so a guess costs one SELECT and one
+    transaction instead of loading the game separately for each step. The UPDATE is
+    conditional on the version that was read; if another request changed the game in the
+    meantime, the guess is evaluated again against the fresh state.
+
+    :param game_id: The ID of the game session where the guess is being made.
+    :param guess: A list of four words that represent the player's guess.
+    :return: A tuple (game, is_correct, is_valid, is_new) where game is the updated game object
+             and the flags are as described in _evaluate_guess.
+    :raises ValueError: If no game is found with the provided ID.
+    :raises StaleDataError: If the game keeps changing concurrently across every attempt.
+    """
+    for attempt in range(_WRITE_ATTEMPTS):
+        game = get_game_from_db(game_id)
+
+        if game is None:
+            raise ValueError("Game not found with the provided game ID.")
+
+        is_correct, is_valid, is_new = _evaluate_guess(game, guess)
+        if not (is_valid and _record_guess(game, guess, is_correct)):
+            break
+
+        try:
+            db.session.commit()
+            break
+        except StaleDataError:
+            # Discard this attempt; the rollback expires the game so the next load is fresh
+            db.session.rollback()
+            if attempt == _WRITE_ATTEMPTS - 1:
+                raise
+
+    return game, is_correct, is_valid, is_new
+
+
 def reset_game(game_id: str, grid: "list[str]", connections: "list[dict]") -> "ConnectionsGame":
     """
     Resets the game with a new grid and connections, updating the game state in the database.
@@ -206,25 +247,65 @@ def reset_game(game_id: str, grid: "list[str]", connections: "list[dict]") -> "C
     :param grid: The new list of words for the game grid.
     :param connections: The new connections dictionary.
     :return: The updated game state.
+    :raises ValueError: If no game is found with the provided ID.
+    :raises StaleDataError: If the game keeps changing concurrently across every attempt.
     """
-    game = get_game_from_db(game_id)
-    if game is None:
-        raise ValueError(f"No game found with the provided ID: {game_id}")
+    for attempt in range(_WRITE_ATTEMPTS):
+        game = get_game_from_db(game_id)
+        if game is None:
+            raise ValueError(f"No game found with the provided ID: {game_id}")
+
+        game.grid = grid
+        game.connections = connections
+        game.previous_guesses = []
+        game.mistakes_left = 4
+        game.status = GameStatus.IN_PROGRESS
 
-    game.grid = grid
-    game.connections = ConnectionsGame.make_connections_mutable(connections)
-    game.previous_guesses = []
-    game.mistakes_left = 4
-    game.status = GameStatus.IN_PROGRESS
-    db.session.commit()
+        try:
+            db.session.commit()
+            break
+        except StaleDataError:
+            # A reset replaces the whole state, so it is simply applied again to the fresh row
+            db.session.rollback()
+            if attempt == _WRITE_ATTEMPTS - 1:
+                raise
 
     return game
 
 
-def get_all_games() -> "list[ConnectionsGame]":
+def get_all_game_states_json() -> str:
     """
-    Retrieves all game data from the database.
+    Builds the state of every game as a single JSON object inside the database.
+
+    The result has the same shape as mapping each game ID to ConnectionsGame.to_state(), but no
+    rows are loaded into Python: the database aggregates and serializes them in one query.
 
-    :return: A list of all game objects.
+    :return: A JSON object string mapping each game ID to its state.
     """
-    return ConnectionsGame.query.all()
+    game = ConnectionsGame
+    if db.engine.dialect.name == "postgresql":
+        grid, connections, previous_guesses = game.grid, game.connections, game.previous_guesses
+        build_object, aggregate = func.json_build_object, func.json_object_agg
+    else:
+        # SQLite stores JSON columns as text, so they are re-parsed with json() to nest as objects
+        grid = func.json(game.grid)
+        connections = func.json(game.connections)
+        previous_guesses = func.json(game.previous_guesses)
+        build_object, aggregate = func.json_object, func.json_group_object
+    state = build_object(
+        "gameId",
+        game.id,
+        "grid",
+        grid,
+        "connections",
+        connections,
+        "mistakesLeft",
+        game.mistakes_left,
+        "status",
+        game.status,
+        "previousGuesses",
+        previous_guesses,
+    )
+    # Cast to text so the driver hands back the serialized JSON instead of decoding it
+    games_json = db.session.execute(db.select(cast(aggregate(game.id, state), db.Text))).scalar()
+    return games_json or "{}"
@@ -6,46 +6,99 @@ validating guesses, and performing game-related operations. It is designed to in
 with the database layer to fetch and update game data as needed.
 
 Functions:
-- validate_id(game_id): Validates if a game ID exists.
 - generate_game_grid(): Generates the game grid and word connections.
 - process_guess(game_id, guess): Processes a guess and updates the game state.
 - create_new_game(): Creates a new game session.
-- get_game_state(game_id): Retrieves the current game state.
+- get_state_version(game_id): Retrieves the version of a game's state.
+- get_game_state_snapshot(game_id): Retrieves a game's state along with its version.
 - restart_game(game_id): Restarts the game with a new grid and resets the game state.
-- get_all_games_data(): Retrieves the status of all games.
+- get_all_games_json(): Retrieves the status of all games as JSON serialized by the database.
 """
 
 import random
+import re
+import sys
 from os import path
-import json
+from types import MappingProxyType
+import orjson
 
 from ..models.models import ConnectionsGame
 from ..dal.dal import (
     add_new_game,
+    get_game_version,
     get_game_from_db,
-    check_guess,
+    apply_guess,
     reset_game,
-    update_game_state,
-    check_game_exists,
-    get_all_games,
+    get_all_game_states_json,
 )
 
 # from utils import call_llm_api
 
+# Game IDs are UUID4s, either 32 hex characters (current) or the canonical 8-4-4-4-12 dashed
+# form (games created before the hex format); IDs must match one of the two forms in full
+_GAME_ID_RE = re.compile(
+    r"[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE
+)
+
+
+def _is_well_formed_id(game_id) -> bool:
+    """
+    Checks that a game ID is a UUID-shaped string, without touching the database.
+
+    :param game_id: The ID to check.
+    :return: True if the ID could belong to a game, False otherwise.
+    """
+    return isinstance(game_id, str) and _GAME_ID_RE.fullmatch(game_id) is not None
+
+
+# Path to the connections template, resolved once relative to this module
+_CONNECTIONS_JSON_PATH = path.normpath(
+    path.join(path.dirname(__file__), "..", "..", "schemas", "connections.json")
+)
+
+
+def _load_connections_template() -> "list[dict]":
+    """
+    Reads and parses 'connections.json'. It is called once at import to build the template.
 
-def validate_id(game_id):
+    :return: The list of connection dictionaries defined in the schema file.
     """
-    Validates if a game ID exists in the database.
+    # orjson parses the raw bytes in C; the file is trusted and needs no text decoding first
+    with open(_CONNECTIONS_JSON_PATH, "rb") as file:
+        return orjson.loads(file.read())
 
-    :param game_id: The ID of the game to validate.
-    :return: True if the game exists, False otherwise.
+
+def _parse_connections(
+    data: "list[dict]",
+) -> "tuple[tuple[str, ...], tuple[MappingProxyType, ...]]":
     """
-    return check_game_exists(game_id)
+    Flattens the connections data into the ordered list of grid words.
+
+    Every word is interned so all games built from the template share one string object per word.
+    The result is read-only (tuples and mapping proxies), so the template can be shared by every
+    game without being mutated through one of them.
+
+    :param data: The list of connection dictionaries, each with a "words" list.
+    :return: A tuple containing the unshuffled grid words and the read-only connections with interned words.
+    """
+    connections = tuple(
+        MappingProxyType(
+            dict(connection, words=tuple(sys.intern(word) for word in connection["words"]))
+        )
+        for connection in data
+    )
+    grid = tuple(word for connection in connections for word in connection["words"])
+    return grid, connections
+
+
+# Parsed once at import so the request path only copies and shuffles
+_TEMPLATE_GRID, _TEMPLATE_CONNECTIONS = _parse_connections(_load_connections_template())
 
 
 def generate_game_grid():
     """
-    Generates the game grid and connections by reading the contents of 'placeholder.json'.
+    Generates the game grid and connections from the template parsed from 'connections.json'
+    at import time.
 
     :return: A tuple containing the game grid (list of words) and the connections
              dictionary mapping word tuples to their connection (relationship).
@@ -71,46 +124,37 @@ def generate_game_grid():
     # sets = llm_response.split("\n")
 
     # TODO: Replace with more sophisticated logic using an LLM
-    # Construct the absolute path to the placeholder.json file
-    current_dir = path.dirname(__file__)  # Gets the directory where this script is located
-    json_path = path.join(
-        current_dir, "../../schemas/connections.json"
-    )  # Constructs the path to the JSON file
-
-    # Load data from placeholder.json
-    with open(json_path, "r") as file:
-        data = json.load(file)
-
-    grid = []
-    connections = []
-
-    for connection in data:
-        grid.extend(connection["words"])
-        connections.append(connection)
-
-    # Shuffle the grid for game variability
-    random.shuffle(grid)
+    # Draw a shuffled copy of the grid for game variability in a single pass
+    grid = random.sample(_TEMPLATE_GRID, len(_TEMPLATE_GRID))
+    # Each game gets its own dict for per-game changes (e.g. "guessed"); the words tuple is shared
+    connections = [dict(connection) for connection in _TEMPLATE_CONNECTIONS]
     return grid, connections
 
 
-def process_guess(game_id: str, guess: "list[str]") -> "tuple[dict, bool, bool, bool]":
+def process_guess(
+    game_id: str, guess: "list[str]"
+) -> "tuple[ConnectionsGame | None, bool, bool, bool]":
     """
-    Validates the guess and updates the game state by calling the respective functions from dal.py.
-    Returns the updated game game state, a boolean confirming whether the guess is valid, whether the guess was correct,
+    Validates the guess and updates the game state through a single call to dal.apply_guess.
+    Returns the updated game, a boolean confirming whether the guess is valid, whether the guess was correct,
     and whether the guess was new.
     :param game_id: The ID of the game session where the guess is being made.
     :param guess: A list of four words that represent the player's guess.
-    :return: A tuple containing the updated game state,
+    :return: A tuple containing the updated game (None if the guess was invalid),
                                 a boolean indicating if the guess was valid,
                                 a boolean indicating if the guess was correct,
                                 and a boolean indicating if the guess was new.
+    :raises ValueError: If the ID is malformed or no game exists with it.
+    :raises StaleDataError: If concurrent changes to the game conflict with every attempt.
     """
-    is_correct, is_valid, is_new = check_guess(game_id, guess)
+    if not _is_well_formed_id(game_id):
+        raise ValueError("Game not found with the provided game ID.")
+
+    # Guesses against a finished game are rejected by apply_guess before anything is written
+    game_state, is_correct, is_valid, is_new = apply_guess(game_id, guess)
     if not is_valid:
         return None, is_valid, False, is_new
 
-    update_game_state(game_id, guess, is_correct)
-    game_state = get_game_from_db(game_id)
     return game_state, is_valid, is_correct, is_new
 
 
@@ -122,36 +166,51 @@ def create_new_game() -> "ConnectionsGame":
     """
     grid, connections = generate_game_grid()
 
-    # Add the new game to the database using the DAL method
-    game_id = add_new_game(grid, connections)
+    # Add the new game to the database using the DAL method; the inserted object is returned
+    # as is, since the session only holds it weakly and reloading it would cost a SELECT
+    return add_new_game(grid, connections)
 
-    # Retrieve the newly created game state from the database
-    game = get_game_from_db(game_id)
 
-    return game
+def get_state_version(game_id: str) -> "int | None":
+    """
+    Retrieves the version of a game's state, which changes whenever the state does.
 
+    :param game_id: The ID of the game session.
+    :return: The version, or None if the ID is malformed or no game exists.
+    """
+    if not _is_well_formed_id(game_id):
+        return None
+    return get_game_version(game_id)
 
-def get_game_state(game_id: str) -> dict:
+
+def get_game_state_snapshot(game_id: str) -> "tuple[dict, int] | None":
     """
-    Retrieves the current game state for the specified game ID.
+    Retrieves a game's state and version from a single primary-key lookup.
 
     :param game_id: The ID of the game session.
-    :return: The Game object if the game exists, raises ValueError otherwise.
+    :return: A tuple (state, version), or None if the ID is malformed or no game exists.
     """
-    game_state = get_game_from_db(game_id)
-    if game_state is None:
-        raise ValueError("No game found with the provided ID.")
-    return game_state
+    if not _is_well_formed_id(game_id):
+        return None
+    game = get_game_from_db(game_id)
+    if game is None:
+        return None
+    return game.to_state(), game.version
 
 
-def restart_game(game_id: str) -> dict:
+def restart_game(game_id: str) -> "ConnectionsGame":
     """
     Restarts the game specified by this id with a new grid and resets the game state.
-    Returns the restarted game state.
+    Returns the restarted game.
 
     :param game_id: The ID of the game session to restart.
-    :return: The restarted game state.
+    :return: The restarted ConnectionsGame object.
+    :raises ValueError: If the ID is malformed or no game exists with it.
+    :raises StaleDataError: If concurrent changes to the game conflict with every attempt.
     """
+    if not _is_well_formed_id(game_id):
+        raise ValueError(f"No game found with the provided ID: {game_id}")
+
     # Generate a new game grid and connections
     grid, connections = generate_game_grid()
 
@@ -159,14 +218,10 @@ def restart_game(game_id: str) -> dict:
     return reset_game(game_id, grid, connections)
 
 
-def get_all_games_data() -> dict:
+def get_all_games_json() -> str:
     """
-    Retrieves the status of all games from the database.
+    Retrieves the status of all games as a JSON object string built by the database.
 
-    :return: A dictionary containing the status of all games.
+    :return: A JSON object string mapping each game ID to its state.
     """
-    all_games = get_all_games()
-    games_data = {}
-    for game in all_games:
-        games_data[game.id] = game.to_state()
-    return games_data
+    return get_all_game_states_json()
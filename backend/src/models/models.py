@@ -7,6 +7,11 @@ Classes:
 
 Functions:
 - make_connections_mutable(connections): Helper function to make connection dictionaries mutable for SQLAlchemy tracking.
+- guess_mask(guess): Converts a guess into a bitmask of its words' grid positions.
+- connection_for_mask(mask): Looks up the connection matching a guess bitmask.
+- find_connection(guess): Looks up the connection matching a guess through the cached bitmask index.
+- has_guessed(guess): Checks whether a guess has already been made, regardless of word order.
+- add_previous_guess(guess): Records a guess in the previous guesses.
 """
 
 import uuid
@@ -15,7 +20,8 @@ from typing import List
 from sqlalchemy.ext.mutable import MutableList, MutableDict
 import enum
 
-db = SQLAlchemy()
+# Objects stay loaded after commit, so serializing a game right after a write needs no re-SELECT
+db = SQLAlchemy(session_options={"expire_on_commit": False})
 
 
 class GameStatus(enum.Enum):
@@ -35,6 +41,7 @@ class ConnectionsGame(db.Model):
         mistakes_left (int): The number of incorrect guesses left for the player in the current game session.
         status (Enum): The current status of the game session, represented by an enum value.
         previous_guesses (JSON): A list of previous guesses made during the game session.
+        version (int): A counter incremented by SQLAlchemy whenever the game state changes.
     """
 
     id: str = db.Column(db.String, primary_key=True)  # Unique identifier for the game session
@@ -49,6 +56,14 @@ class ConnectionsGame(db.Model):
     previous_guesses: List[str] = db.Column(
         MutableList.as_mutable(db.JSON), default=list
     )  # List of previous guesses made during the game
+    version: int = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )  # Incremented on every state change, used to build the /game-status ETag
+
+    # SQLAlchemy bumps the version on every UPDATE and only applies it if the row still has the
+    # version that was read, so concurrent writes to one game fail with StaleDataError instead of
+    # silently overwriting each other
+    __mapper_args__ = {"version_id_col": version}
 
     @staticmethod
     def make_connections_mutable(connections):
@@ -62,6 +77,110 @@ class ConnectionsGame(db.Model):
         # and converts each connection dictionary into a MutableDict to track changes in SQLAlchemy.
         return [MutableDict.coerce(key, conn) for key, conn in enumerate(connections)]
 
+    def _mask_index(self):
+        """
+        Returns the bitmask index for the current grid and connections, rebuilding it when either changes.
+
+        Each grid word is assigned a bit 0-15, and each connection is keyed by the mask of its four words.
+        The index is derived from the stored JSON and kept on the instance only, so nothing extra is persisted.
+
+        :return: A tuple (word_bits, connections_by_mask).
+        """
+        cached = getattr(self, "_mask_cache", None)
+        if cached is None or cached[0] is not self.grid or cached[1] is not self.connections:
+            word_bits = {word: 1 << index for index, word in enumerate(self.grid)}
+            connections_by_mask = {}
+            for connection in self.connections:
+                mask = 0
+                for word in connection["words"]:
+                    mask |= word_bits[word]
+                connections_by_mask[mask] = connection
+            cached = self._mask_cache = (
+                self.grid,
+                self.connections,
+                word_bits,
+                connections_by_mask,
+            )
+        return cached[2], cached[3]
+
+    def guess_mask(self, guess):
+        """
+        Converts a guess into the bitmask of its words' grid positions.
+
+        Repeated words set the same bit, so the mask's popcount is the number of distinct words.
+
+        :param guess: The words of the player's guess.
+        :return: The bitmask, or None if any word is not in the grid.
+        """
+        word_bits = self._mask_index()[0]
+        mask = 0
+        try:
+            for word in guess:
+                mask |= word_bits[word]
+        except KeyError:
+            return None
+        return mask
+
+    def connection_for_mask(self, mask):
+        """
+        Finds the connection whose words produce exactly the given bitmask.
+
+        :param mask: A bitmask built by guess_mask.
+        :return: The matching connection dictionary, or None if no connection matches.
+        """
+        return self._mask_index()[1].get(mask)
+
+    def find_connection(self, guess):
+        """
+        Finds the connection whose words match the guess, regardless of word order.
+
+        :param guess: The words of the player's guess.
+        :return: The matching connection dictionary, or None if no connection matches.
+        """
+        mask = self.guess_mask(guess)
+        return None if mask is None else self.connection_for_mask(mask)
+
+    def _previous_guess_set(self):
+        """
+        Returns the previous guesses as a set of frozensets, rebuilding it when the list is replaced
+        or changed outside add_previous_guess.
+
+        :return: The set of previous guesses, each as a frozenset of its words.
+        """
+        cached = getattr(self, "_previous_guess_cache", None)
+        if (
+            cached is None
+            or cached[0] is not self.previous_guesses
+            or cached[1] != len(self.previous_guesses)
+        ):
+            guesses = {frozenset(guess) for guess in self.previous_guesses}
+            cached = self._previous_guess_cache = (
+                self.previous_guesses,
+                len(self.previous_guesses),
+                guesses,
+            )
+        return cached[2]
+
+    def has_guessed(self, guess):
+        """
+        Checks whether the same words have already been guessed, in any order.
+
+        :param guess: The words of the player's guess.
+        :return: True if the guess has been made before, False otherwise.
+        """
+        return frozenset(guess) in self._previous_guess_set()
+
+    def add_previous_guess(self, guess):
+        """
+        Records a guess in the previous guesses, keeping the lookup set in step.
+
+        :param guess: The words of the player's guess.
+        """
+        guesses = self._previous_guess_set()
+        self.previous_guesses.append(guess)
+        guesses.add(frozenset(guess))
+        self._previous_guess_cache = (self.previous_guesses, len(self.previous_guesses), guesses)
+
     def __init__(self, *args, **kwargs):
         super(ConnectionsGame, self).__init__(*args, **kwargs)
         self.connections = self.make_connections_mutable(self.connections)
@@ -6,12 +6,33 @@ parsing and validating request data, and creating JSON responses.
 
 Functions:
 - call_gpt_api(prompt): Calls the GPT API to generate words and their connections.
-- parse_and_validate_request(required_fields): Parses and validates the request JSON payload.
+- parse_and_validate_request(validate): Parses the request JSON payload and validates it against a schema.
 - create_response(data, error, status_code): Creates a JSON response with the provided data or error message.
+- create_raw_data_response(data_json, status_code): Creates a JSON response around already-serialized data.
 """
 
+import threading
+import fastjsonschema
+import orjson
 import requests
-from flask import request, jsonify
+from flask import Response, request
+
+# One HTTP session per thread, so LLM API calls reuse pooled TCP/TLS connections instead of
+# reconnecting each time; requests.Session is not documented as thread-safe and Gunicorn runs
+# several threads per worker
+_LLM_SESSIONS = threading.local()
+
+
+def _llm_session():
+    """
+    Returns the calling thread's HTTP session for LLM API calls, creating it on first use.
+
+    :return: The thread's requests.Session.
+    """
+    session = getattr(_LLM_SESSIONS, "session", None)
+    if session is None:
+        session = _LLM_SESSIONS.session = requests.Session()
+    return session
 
 
 def call_llm_api(prompt):
@@ -27,7 +48,7 @@ def call_llm_api(prompt):
     data = {"prompt": prompt, "max_tokens": 100, "temperature": 0.7}
 
     try:
-        response = requests.post(api_url, headers=headers, json=data)
+        response = _llm_session().post(api_url, headers=headers, json=data, timeout=60)
         response.raise_for_status()
         result = response.json()
         return result["choices"][0]["text"].strip()
@@ -39,26 +60,48 @@ def call_llm_api(prompt):
         return ""
 
 
-def parse_and_validate_request(required_fields):
+# Error messages that never vary, serialized once so their responses skip JSON encoding
+_STATIC_ERROR_BODIES = {
+    error: orjson.dumps({"error": error})
+    for error in (
+        "Not Found",
+        "Internal Server Error",
+        "Invalid game ID.",
+        "Invalid guess.",
+        "Failed to generate the game grid.",
+        "Request payload is empty",
+        "Request payload is not valid JSON",
+    )
+}
+
+
+def parse_and_validate_request(validate):
     """
-    Parses the request JSON payload and validates the presence of required fields.
+    Parses the request JSON payload and validates it against a compiled JSON schema.
 
-    :param required_fields: A list of strings representing required field names.
+    :param validate: A validator compiled with fastjsonschema.compile, checking the required
+                     fields and their types.
     :return: A tuple of (data, error). If successful, data contains the parsed JSON
              and error is None. On failure, data is None and error contains an error message.
     """
+    # Decode the raw body with orjson; the payload is only read once so it need not be cached
+    raw = request.get_data(cache=False)
     try:
-        data = request.get_json(force=True)
-        if not data:
-            raise ValueError("Request payload is empty")
+        data = orjson.loads(raw) if raw else None
+    except orjson.JSONDecodeError:
+        return None, "Request payload is not valid JSON"
+    if not data:
+        return None, "Request payload is empty"
+    if not isinstance(data, dict):
+        return None, "Request payload must be a JSON object"
 
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+    # The schema reports missing fields, wrong types and a guess of the wrong length
+    try:
+        validate(data)
+    except fastjsonschema.JsonSchemaValueException as e:
+        return None, f"Invalid request payload: {e.message}"
 
-        return data, None
-    except Exception as e:
-        return None, str(e)
+    return data, None
 
 
 def create_response(data=None, error=None, status_code=200):
@@ -70,9 +113,28 @@ def create_response(data=None, error=None, status_code=200):
     :param status_code: The HTTP status code for the response (default: 200).
     :return: A JSON response with the provided data or error message.
     """
+    if data is None and error in _STATIC_ERROR_BODIES:
+        # Fixed error messages reuse the body serialized at import
+        return Response(_STATIC_ERROR_BODIES[error], mimetype="application/json"), status_code
+
     response = {}
     if data is not None:
         response["data"] = data
     if error is not None:
         response["error"] = error
-    return jsonify(response), status_code
+    # Serialize straight to bytes with orjson rather than going through jsonify's str encoding
+    body = orjson.dumps(response, option=orjson.OPT_NON_STR_KEYS)
+    return Response(body, mimetype="application/json"), status_code
+
+
+def create_raw_data_response(data_json: str, status_code=200):
+    """
+    Creates a JSON response whose data member is an already-serialized JSON value.
+
+    :param data_json: The serialized JSON to include as the response data.
+    :param status_code: The HTTP status code for the response (default: 200).
+    :return: A JSON response with the same envelope as create_response.
+    """
+    # Splice the JSON text into the envelope so it is never parsed and re-serialized
+    body = '{"data":' + data_json + "}"
+    return Response(body, mimetype="application/json"), status_code
@@ -1,312 +1,263 @@
-import json
+import os
 import unittest
-from unittest import mock
 from unittest.mock import patch
-from unittest.mock import MagicMock
 
-from flask import Flask
-from backend.src.blueprints.api.routes import (
-    game_status,
-    generate_grid,
-    submit_guess,
-    restart_game,
-)
-from backend.src.services.utils import create_response
-from backend.src.models.models import db
+from sqlalchemy.orm.exc import StaleDataError
+from backend.src.app import create_app
+from backend.src.blueprints.api.routes import _CONFLICT_ERROR
+from backend.src.dal.dal import add_new_game
+from backend.src.models.models import ConnectionsGame, db
 
 
-class TestAPI(unittest.TestCase):
+class TestRoutes(unittest.TestCase):
 
     def setUp(self):
-        # API
-        # Set up Flask app and push application context
-        self.app = Flask(__name__)
-        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        # Requests go through the full application, backed by an in-memory database
+        with patch.dict(os.environ, {"DATABASE_URL": "sqlite:///:memory:"}):
+            self.app = create_app()
         self.app.config["TESTING"] = True
-        db.init_app(self.app)
-        with self.app.app_context():
-            db.create_all()  # Create all tables
         self.ctx = self.app.app_context()
         self.ctx.push()
+        db.create_all()
+        self.client = self.app.test_client()
 
+        words = [f"word{i}" for i in range(16)]
         self.connections = [
-            {
-                "relationship": "Fruits",
-                "guessed": False,
-                "words": ["apple", "banana", "cherry", "date"],
-            },
-            {
-                "relationship": "Ocean Life",
-                "guessed": False,
-                "words": ["whale", "coral", "shark", "dolphin"],
-            },
-            {
-                "relationship": "Space Exploration",
-                "guessed": False,
-                "words": ["astronaut", "rocket", "satellite", "nebula"],
-            },
-            {
-                "relationship": "Musical Instruments",
-                "guessed": False,
-                "words": ["guitar", "piano", "violin", "drum"],
-            },
+            {"relationship": f"Group {i}", "guessed": False, "words": words[i * 4 : i * 4 + 4]}
+            for i in range(4)
         ]
-        self.grid = [word for connection in self.connections for word in connection["words"]]
+        self.grid = words
 
     def tearDown(self):
-        # Close all sessions first while the application context is still active
         db.session.remove()
-        # Then pop the application context
+        db.drop_all()
         self.ctx.pop()
 
-    @patch("backend.src.api.create_new_game")
-    @patch("backend.src.api.create_response")
-    def test_generate_grid(self, mock_create_response, mock_create_new_game):
-        # Setup
-        mock_game = mock_create_new_game.return_value
-        mock_game.id = "12345"
-
-        # Test successful grid generation
-        mock_create_new_game.return_value = mock_game
-        expected_response = create_response(data={"gameId": "12345"}, status_code=201)
-        mock_create_response.return_value = expected_response
-
-        response = generate_grid()
-        mock_create_response.assert_called_once_with(data={"gameId": "12345"}, status_code=201)
-        self.assertEqual(response, expected_response)
-
-        # Test failure in grid generation
-        mock_create_new_game.return_value = None
-        error_response = create_response(error="Failed to generate the game grid.", status_code=500)
-        mock_create_response.return_value = error_response
-
-        response = generate_grid()
-        mock_create_response.assert_called_with(
-            error="Failed to generate the game grid.", status_code=500
+    def post_error(self, route, payload):
+        # Posts a payload expected to be rejected and returns the error message
+        response = self.client.post(f"/connections/{route}", json=payload)
+        self.assertEqual(response.status_code, 400)
+        return response.get_json()["error"]
+
+    def test_submit_guess_missing_field(self):
+        self.assertEqual(
+            self.post_error("submit-guess", {"gameId": "0123456789abcdef0123456789abcdef"}),
+            "Invalid request payload: data must contain ['guess'] properties",
         )
-        self.assertEqual(response, error_response)
-
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.parse_and_validate_request")
-    @patch("backend.src.api.validate_id")
-    @patch("backend.src.api.process_guess")
-    def test_submit_guess_valid_guess(
-        self,
-        mock_process_guess,
-        mock_validate_id,
-        mock_parse_and_validate_request,
-        mock_create_response,
-    ):
-        # Setup for valid guess
-        mock_parse_and_validate_request.return_value = (
-            {"gameId": "12345", "guess": ["word1", "word2", "word3", "word4"]},
-            None,
+
+    def test_submit_guess_wrong_type(self):
+        self.assertEqual(
+            self.post_error("submit-guess", {"gameId": 1, "guess": ["a", "b", "c", "d"]}),
+            "Invalid request payload: data.gameId must be string",
         )
-        mock_validate_id.return_value = True
-        mock_process_guess.return_value = (MagicMock(), True, True, True)
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_create_response.return_value = mock_response
 
-        # Execute
-        response = submit_guess()
+    def test_submit_guess_wrong_length(self):
+        self.assertEqual(
+            self.post_error("submit-guess", {"gameId": "abc", "guess": ["a", "b", "c"]}),
+            "Invalid request payload: data.guess must contain at least 4 items",
+        )
+        self.assertEqual(
+            self.post_error("submit-guess", {"gameId": "abc", "guess": ["a", "b", "c", "d", "e"]}),
+            "Invalid request payload: data.guess must contain less than or equal to 4 items",
+        )
+
+    def test_restart_game_missing_field(self):
+        self.assertEqual(
+            self.post_error("restart-game", {"guess": ["a", "b", "c", "d"]}),
+            "Invalid request payload: data must contain ['gameId'] properties",
+        )
 
-        # Verify
-        mock_create_response.assert_called_once_with(data=mock.ANY)
+    def add_game(self):
+        # Stores a game built from the test connections and returns it
+        return add_new_game(self.grid, self.connections)
+
+    def get_status(self, game_id, etag=None, **headers):
+        # Requests the game status, revalidating against an ETag when one is given
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return self.client.get(
+            "/connections/game-status", query_string={"gameId": game_id}, headers=headers
+        )
+
+    def test_game_status_etag(self):
+        # A 200 carries the game state and a weak ETag built from the game ID and its version
+        game = self.add_game()
+        response = self.get_status(game.id)
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["data"], game.to_state())
+        self.assertEqual(response.headers["ETag"], f'W/"{game.id}-{game.version}"')
+
+    def test_game_status_not_modified(self):
+        # A matching If-None-Match is answered with an empty 304 that echoes the ETag
+        game = self.add_game()
+        etag = self.get_status(game.id).headers["ETag"]
+        response = self.get_status(game.id, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_game_status_not_modified_compressed(self):
+        # Flask-Compress appends the encoding to the ETag of a compressed response, which still
+        # matches the state
+        game = self.add_game()
+        etag = f'W/"{game.id}-{game.version}:br"'
+        response = self.get_status(game.id, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+
+        # Whatever ETag the installed Flask-Compress sends with a compressed body revalidates too
+        compressed = self.get_status(game.id, **{"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers.get("Content-Encoding"), "gzip")
+        response = self.get_status(game.id, compressed.headers["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_game_status_modified_after_guess(self):
+        # A guess bumps the version, so the old ETag no longer matches and a fresh 200 is sent
+        game = self.add_game()
+        etag = self.get_status(game.id).headers["ETag"]
+        guess = self.client.post(
+            "/connections/submit-guess",
+            json={"gameId": game.id, "guess": self.connections[0]["words"]},
+        )
+        self.assertEqual(guess.status_code, 200)
 
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.game.validate_id")
-    def test_submit_guess_invalid_game_id(self, mock_validate_id, mock_create_response):
-        # Setup for invalid game ID
-        mock_validate_id.return_value = False
-
-        # Execute
-        with self.app.test_request_context(
-            "/path",
-            method="POST",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"gameId": "12345", "guess": ["word1", "word2", "word3", "word4"]}),
-        ):
-            response = submit_guess()
-
-        # Verify
-        mock_create_response.assert_called_with(error="Invalid game ID.", status_code=404)
-
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.process_guess")
-    @patch("backend.src.api.validate_id")
-    def test_submit_guess_invalid_guess(
-        self, mock_validate_id, mock_process_guess, mock_create_response
-    ):
-        # Setup for invalid guess
-        mock_validate_id.return_value = True
-        mock_process_guess.return_value = (None, False, False, False)
-        mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_create_response.return_value = mock_response
-
-        # Execute
-        with self.app.test_request_context(
-            "/path",
-            method="POST",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"gameId": "12345", "guess": ["word1", "word2", "word3", "word4"]}),
-        ):
-            response = submit_guess()
-
-        # Verify
-        mock_create_response.assert_called_with(error="Invalid guess.", status_code=400)
-        self.assertEqual(response.status_code, 400)
+        response = self.get_status(game.id, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.headers["ETag"], f'W/"{game.id}-{game.version}"')
+        self.assertTrue(response.get_json()["data"]["connections"][0]["guessed"])
 
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_submit_guess_error_in_request_parsing(
-        self, mock_parse_and_validate_request, mock_create_response
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = (None, "Error parsing request")
-        mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_create_response.return_value = mock_response
-
-        # Execute
-        with self.app.test_request_context(
-            "/path",
-            method="POST",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"gameId": "12345", "guess": ["word1", "word2", "word3", "word4"]}),
-        ):
-            response = submit_guess()
-
-        # Verify
-        mock_create_response.assert_called_with(error="Error parsing request", status_code=400)
-        self.assertEqual(response.status_code, 400)
+    def test_game_status_wildcard_is_ignored(self):
+        # A wildcard If-None-Match would match every game, so the state is sent in full
+        game = self.add_game()
+        self.assertEqual(self.get_status(game.id, "*").status_code, 200)
 
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_game_status_error_in_request_parsing(
-        self, mock_parse_and_validate_request, mock_create_response
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = (None, "Error parsing request")
-        mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_create_response.return_value = mock_response
-
-        # Execute
-        response = game_status()
-
-        # Verify
-        mock_create_response.assert_called_with(error="Error parsing request", status_code=400)
+    def test_game_status_missing_game_id(self):
+        response = self.client.get("/connections/game-status")
         self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.get_json()["error"],
+            "Invalid request parameters: data must contain ['gameId'] properties",
+        )
 
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.validate_id")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_game_status_invalid_id(
-        self, mock_parse_and_validate_request, mock_validate_id, mock_create_response
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = ({"gameId": "invalid_id"}, None)
-        mock_validate_id.return_value = False
-        mock_response = MagicMock()
-        mock_response.status_code = 404
-        mock_create_response.return_value = mock_response
-
-        # Execute
-        response = game_status()
-
-        # Verify
-        mock_create_response.assert_called_with(error="Invalid game ID.", status_code=404)
+    def test_game_status_unknown_game(self):
+        response = self.get_status("0123456789abcdef0123456789abcdef", 'W/"x-1"')
         self.assertEqual(response.status_code, 404)
-
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.get_game_state")
-    @patch("backend.src.api.validate_id")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_game_status_valid_input(
-        self,
-        mock_parse_and_validate_request,
-        mock_validate_id,
-        mock_get_game_state,
-        mock_create_response,
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = ({"gameId": "valid_id"}, None)
-        mock_validate_id.return_value = True
-        mock_game_state = MagicMock()
-        mock_game_state.to_state.return_value = {"gameId": "valid_id", "status": "IN_PROGRESS"}
-        mock_get_game_state.return_value = mock_game_state
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_create_response.return_value = mock_response
-
-        # Execute
-        response = game_status()
-
-        # Verify
-        mock_create_response.assert_called_with(
-            data={"gameId": "valid_id", "status": "IN_PROGRESS"}
+        self.assertEqual(self.get_status("not-a-game-id").status_code, 404)
+
+    def test_game_status_rejects_post(self):
+        # Conditional 304s are only valid for GET and HEAD, so the route does not accept POST
+        game = self.add_game()
+        response = self.client.post("/connections/game-status", json={"gameId": game.id})
+        self.assertEqual(response.status_code, 405)
+
+    def test_submit_guess_conflict(self):
+        # A guess that keeps conflicting with concurrent writes is answered with 409
+        game = self.add_game()
+        with patch("backend.src.game.game.apply_guess", side_effect=StaleDataError()):
+            response = self.client.post(
+                "/connections/submit-guess",
+                json={"gameId": game.id, "guess": self.connections[0]["words"]},
+            )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()["error"], _CONFLICT_ERROR)
+
+    def test_restart_game_conflict(self):
+        # A restart that keeps conflicting with concurrent writes is answered with 409
+        game = self.add_game()
+        with patch("backend.src.game.game.reset_game", side_effect=StaleDataError()):
+            response = self.client.post("/connections/restart-game", json={"gameId": game.id})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()["error"], _CONFLICT_ERROR)
+
+    def test_generate_grid(self):
+        # A new game is stored and its ID returned
+        response = self.client.get("/connections/generate-grid")
+        self.assertEqual(response.status_code, 201)
+        game_id = response.get_json()["data"]["gameId"]
+        self.assertIsNotNone(db.session.get(ConnectionsGame, game_id))
+
+    def test_submit_guess_valid_guess(self):
+        # A correct guess returns the updated game state along with the guess flags
+        game = self.add_game()
+        response = self.client.post(
+            "/connections/submit-guess",
+            json={"gameId": game.id, "guess": self.connections[1]["words"][::-1]},
         )
         self.assertEqual(response.status_code, 200)
+        data = response.get_json()["data"]
+        self.assertEqual(data, dict(game.to_state(), isCorrect=True, isNewGuess=True))
+        self.assertTrue(data["connections"][1]["guessed"])
+        self.assertEqual(data["mistakesLeft"], 4)
+
+    def test_submit_guess_incorrect_guess(self):
+        # An incorrect guess costs a mistake
+        game = self.add_game()
+        guess = [self.grid[0], self.grid[4], self.grid[8], self.grid[12]]
+        response = self.client.post(
+            "/connections/submit-guess", json={"gameId": game.id, "guess": guess}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()["data"]
+        self.assertFalse(data["isCorrect"])
+        self.assertEqual(data["mistakesLeft"], 3)
+        self.assertEqual(data["previousGuesses"], [guess])
+
+    def test_submit_guess_invalid_game_id(self):
+        # A well-formed ID without a game and a malformed ID are both reported as unknown
+        for game_id in ("0123456789abcdef0123456789abcdef", "not-a-game-id"):
+            with self.subTest(game_id=game_id):
+                response = self.client.post(
+                    "/connections/submit-guess",
+                    json={"gameId": game_id, "guess": self.connections[0]["words"]},
+                )
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.get_json()["error"], "Invalid game ID.")
+
+    def test_submit_guess_invalid_guess(self):
+        # A guess with a word outside the grid is rejected without changing the game
+        game = self.add_game()
+        response = self.client.post(
+            "/connections/submit-guess",
+            json={"gameId": game.id, "guess": ["word0", "word1", "word2", "elsewhere"]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Invalid guess.")
+        self.assertEqual(game.previous_guesses, [])
+        self.assertEqual(game.mistakes_left, 4)
 
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_restart_game_error_in_request_parsing(
-        self, mock_parse_and_validate_request, mock_create_response
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = (None, "Error parsing request")
-        mock_create_response.return_value = MagicMock(status_code=400)
-
-        # Execute
-        response = restart_game()  # Added dummy ID for the function call
+    def test_submit_guess_error_in_request_parsing(self):
+        response = self.client.post(
+            "/connections/submit-guess", data="{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Request payload is not valid JSON")
 
-        # Verify
-        mock_create_response.assert_called_with(error="Error parsing request", status_code=400)
+    def test_restart_game_error_in_request_parsing(self):
+        response = self.client.post("/connections/restart-game", json={})
         self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Request payload is empty")
 
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.validate_id")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_restart_game_invalid_id(
-        self, mock_parse_and_validate_request, mock_validate_id, mock_create_response
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = ({"gameId": "invalid_id"}, None)
-        mock_validate_id.return_value = False
-        mock_create_response.return_value = MagicMock(status_code=404)
-
-        # Execute
-        response = restart_game()  # Using the specific invalid ID
-
-        # Verify
-        mock_create_response.assert_called_with(error="Invalid game ID.", status_code=404)
+    def test_restart_game_invalid_id(self):
+        response = self.client.post(
+            "/connections/restart-game", json={"gameId": "0123456789abcdef0123456789abcdef"}
+        )
         self.assertEqual(response.status_code, 404)
-
-    @patch("backend.src.api.create_response")
-    @patch("backend.src.api.restart_game")
-    @patch("backend.src.api.validate_id")
-    @patch("backend.src.api.parse_and_validate_request")
-    def test_restart_game_valid_request(
-        self,
-        mock_parse_and_validate_request,
-        mock_validate_id,
-        mock_restart_game,
-        mock_create_response,
-    ):
-        # Setup
-        mock_parse_and_validate_request.return_value = ({"gameId": "valid_id"}, None)
-        mock_validate_id.return_value = True
-        mock_game = MagicMock()
-        mock_game.to_state.return_value = {"gameId": "valid_id", "status": "RESTARTED"}
-        mock_restart_game.return_value = mock_game
-        mock_create_response.return_value = MagicMock(status_code=200)
-
-        # Execute
-        response = restart_game()  # Using the specific valid ID
-
-        # Verify
-        mock_create_response.assert_called_with(data={"gameId": "valid_id", "status": "RESTARTED"})
+        self.assertEqual(response.get_json()["error"], "Invalid game ID.")
+
+    def test_restart_game_valid_request(self):
+        # A restart replaces the grid and clears the game's progress
+        game = self.add_game()
+        guess = [self.grid[0], self.grid[4], self.grid[8], self.grid[12]]
+        self.client.post("/connections/submit-guess", json={"gameId": game.id, "guess": guess})
+        response = self.client.post("/connections/restart-game", json={"gameId": game.id})
         self.assertEqual(response.status_code, 200)
+        data = response.get_json()["data"]
+        self.assertEqual(data.keys(), game.to_state().keys())
+        self.assertEqual(data["gameId"], game.id)
+        self.assertEqual(data["grid"], game.grid)
+        self.assertNotEqual(set(data["grid"]), set(self.grid))  # The grid comes from the template
+        self.assertEqual(len(data["grid"]), 16)
+        self.assertEqual(data["mistakesLeft"], 4)
+        self.assertEqual(data["previousGuesses"], [])
+        self.assertEqual(data["status"], "IN_PROGRESS")
@@ -1,15 +1,22 @@
+import json
+import os
+import tempfile
 import unittest
 from unittest.mock import patch
 from flask import Flask
 from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from backend.src.dal.dal import (
+    _evaluate_guess,
+    _record_guess,
     add_new_game,
+    add_new_games,
     all_conditions_for_win_met,
-    check_game_exists,
+    apply_guess,
     check_game_over,
+    get_all_game_states_json,
     get_game_from_db,
-    update_game_state,
-    check_guess,
     reset_game,
 )
 from backend.src.models.models import GameStatus, db, ConnectionsGame
@@ -56,52 +63,28 @@ class TestDAL(unittest.TestCase):
         # Then pop the application context
         self.ctx.pop()
 
-    @patch("backend.src.dal.db.session.add")
-    @patch("backend.src.dal.db.session.commit")
-    def test_add_new_game(self, mock_commit, mock_add):
+    @patch("backend.src.dal.dal.db.session.add_all")
+    @patch("backend.src.dal.dal.db.session.commit")
+    def test_add_new_game(self, mock_commit, mock_add_all):
         # Test to ensure a new game can be added to the database correctly.
-        # This test checks if the `add` and `commit` methods of the database session are called.
-        game_id = add_new_game(self.grid, self.connections)
-        self.assertIsNotNone(game_id)  # Ensure that a game ID is returned (not None)
-        mock_add.assert_called()  # Verify that the session's add method was called
-        mock_commit.assert_called()  # Verify that the session's commit method was called
-
-    @patch("backend.src.models.ConnectionsGame.query")
-    def test_check_game_exists(self, mock_query):
-        # Test to check if the function correctly identifies existing and non-existing games.
-        # This test uses a mock query object to simulate database responses.
-        with self.app.app_context():
-            mock_query.filter_by.return_value.first.return_value = ConnectionsGame()
-            self.assertTrue(check_game_exists(1))  # Check for an existing game
-            mock_query.filter_by.return_value.first.return_value = None
-            self.assertFalse(check_game_exists(999))  # Check for a non-existing game
-
-    @patch("backend.src.dal.check_game_exists", return_value=True)
-    @patch("backend.src.models.ConnectionsGame.query")
-    def test_get_game_from_db(self, mock_query, mock_check_game_exists):
-        # Test to ensure a game can be retrieved from the database when it exists.
-        # This test also checks if the function returns a ConnectionsGame instance and verifies mutable connections.
-        mock_game = ConnectionsGame()
-        mock_game.connections = [{"key": "value"}]  # Setup a mock connections list
-        mock_query.filter_by.return_value.first.return_value = mock_game
-        game = get_game_from_db(1)
-        self.assertIsInstance(
-            game, ConnectionsGame
-        )  # Verify that the returned object is an instance of Game
-        self.assertIsInstance(
-            game.connections[0], MutableDict
-        )  # Verify that the connections are mutable dictionaries
-
-    @patch("backend.src.dal.check_game_exists", return_value=False)
-    def test_get_game_from_db_returns_none(self, mock_check_game_exists):
-        # Test to ensure that None is returned when trying to retrieve a non-existing game.
-        # This test checks the error handling of the function.
-        result = get_game_from_db(999)
-        self.assertIsNone(result)
+        # This test checks that the game is added as a one-element batch and committed once.
+        game = add_new_game(self.grid, self.connections)
+        self.assertIsNotNone(game.id)  # Ensure that the returned game has an ID (not None)
+        mock_add_all.assert_called_once_with([game])  # The game is added as a single-game batch
+        mock_commit.assert_called_once()  # Verify that the session committed only once
+
+    @patch("backend.src.dal.dal.db.session.commit")
+    def test_add_new_games(self, mock_commit):
+        # Test to ensure several games are added in one transaction, in the order given.
+        # This test checks that every game is created and that the session commits exactly once.
+        puzzles = [(self.grid, self.connections), (self.grid[::-1], self.connections)]
+        games = add_new_games(puzzles)
+        self.assertEqual(len(games), 2)  # One game per puzzle
+        self.assertEqual(games[1].grid, self.grid[::-1])  # Games keep the order of the puzzles
+        self.assertNotEqual(games[0].id, games[1].id)  # Each game gets its own ID
+        mock_commit.assert_called_once()  # Verify that the session committed only once
 
-    @patch("backend.src.dal.get_game_from_db")
-    @patch("backend.src.dal.db.session.commit")
-    def test_update_game_state(self, mock_commit, mock_get_game_from_db):
+    def test_record_guess(self):
         # Setup
         game = ConnectionsGame(
             id="test_game_id",
@@ -113,55 +96,53 @@ class TestDAL(unittest.TestCase):
             mistakes_left=3,
             previous_guesses=[],
         )
-        mock_get_game_from_db.return_value = game
 
         # Test that no update occurs if the guess has already been made
         game.previous_guesses.append(["word1", "word2"])
-        update_game_state("test_game_id", ["word1", "word2"], True)
+        self.assertFalse(_record_guess(game, ["word1", "word2"], True))
         self.assertEqual(game.mistakes_left, 3)
         self.assertFalse(game.connections[0]["guessed"])
-        mock_commit.assert_not_called()
+
+        # Test that the same words in another order also count as already guessed
+        self.assertFalse(_record_guess(game, ["word2", "word1"], False))
+        self.assertEqual(game.mistakes_left, 3)  # No mistake is charged for the repeat
+        self.assertEqual(game.previous_guesses, [["word1", "word2"]])  # Nothing is recorded
 
         # Test that a new guess is added to previous guesses
-        update_game_state("test_game_id", ["word3", "word4"], False)
+        self.assertTrue(_record_guess(game, ["word3", "word4"], False))
         self.assertIn(["word3", "word4"], game.previous_guesses)
         self.assertEqual(game.mistakes_left, 2)  # Mistakes should decrease by 1
-        mock_commit.assert_called()
-
-        # Reset mock
-        mock_commit.reset_mock()
 
         # Test that a correct guess updates the guessed status of the connection
         game.previous_guesses = []
-        update_game_state("test_game_id", ["word1", "word2"], True)
+        self.assertTrue(_record_guess(game, ["word1", "word2"], True))
         self.assertTrue(game.connections[0]["guessed"])
-        mock_commit.assert_called()
 
-    @patch("backend.src.dal.db.session.commit")
+    @patch("backend.src.dal.dal.db.session.commit")
     def test_check_game_over_loss(self, mock_commit):
         # Test to ensure the game status is set to LOSS when no mistakes are left
         game = ConnectionsGame(mistakes_left=0, connections=[{"guessed": False}])
         check_game_over(game)
         self.assertEqual(game.status, GameStatus.LOSS)
-        mock_commit.assert_called()
+        mock_commit.assert_not_called()
 
-    @patch("backend.src.dal.all_conditions_for_win_met", return_value=True)
-    @patch("backend.src.dal.db.session.commit")
+    @patch("backend.src.dal.dal.all_conditions_for_win_met", return_value=True)
+    @patch("backend.src.dal.dal.db.session.commit")
     def test_check_game_over_win(self, mock_commit, mock_all_conditions_for_win_met):
         # Test to ensure the game status is set to WIN when all conditions for a win are met
         game = ConnectionsGame(mistakes_left=3, connections=[{"guessed": True}])
         check_game_over(game)
         self.assertEqual(game.status, GameStatus.WIN)
-        mock_commit.assert_called()
+        mock_commit.assert_not_called()
 
-    @patch("backend.src.dal.all_conditions_for_win_met", return_value=False)
-    @patch("backend.src.dal.db.session.commit")
+    @patch("backend.src.dal.dal.all_conditions_for_win_met", return_value=False)
+    @patch("backend.src.dal.dal.db.session.commit")
     def test_check_game_over_in_progress(self, mock_commit, mock_all_conditions_for_win_met):
         # Test to ensure the game status remains IN PROGRESS when not all conditions for a win are met and mistakes are left
         game = ConnectionsGame(mistakes_left=1, connections=[{"guessed": False}])
         check_game_over(game)
         self.assertEqual(game.status, GameStatus.IN_PROGRESS)
-        mock_commit.assert_called()
+        mock_commit.assert_not_called()
 
     @patch("backend.src.dal.ConnectionsGame")
     def test_all_conditions_for_win_met(self, mock_game):
@@ -185,8 +166,7 @@ class TestDAL(unittest.TestCase):
         # Test when not all conditions for a win are met
         self.assertFalse(all_conditions_for_win_met(mock_game.return_value))
 
-    @patch("backend.src.dal.get_game_from_db")
-    def test_is_guess_correct(self, mock_get_game_from_db):
+    def test_evaluate_guess(self):
         # Setup
         game_id = "test_game_id"
         correct_guess = ["apple", "banana", "cherry", "date"]
@@ -208,42 +188,45 @@ class TestDAL(unittest.TestCase):
             previous_guesses=[],
         )
 
-        # Mock the database call to return the game object
-        mock_get_game_from_db.return_value = game
-
         # Test correct guess
-        is_correct, is_valid, is_new = check_guess(game_id, correct_guess)
+        is_correct, is_valid, is_new = _evaluate_guess(game, correct_guess)
         self.assertTrue(is_correct)
         self.assertTrue(is_valid)
         self.assertTrue(is_new)
 
         # Test incorrect guess
-        is_correct, is_valid, is_new = check_guess(game_id, incorrect_guess)
+        is_correct, is_valid, is_new = _evaluate_guess(game, incorrect_guess)
         self.assertFalse(is_correct)
         self.assertTrue(is_valid)
         self.assertTrue(is_new)
 
         # Test invalid guess (duplicate words)
-        is_correct, is_valid, is_new = check_guess(game_id, invalid_guess)
+        is_correct, is_valid, is_new = _evaluate_guess(game, invalid_guess)
         self.assertFalse(is_correct)
         self.assertFalse(is_valid)
         self.assertTrue(is_new)
 
         # Test duplicate guess (already guessed)
         game.previous_guesses.append(correct_guess)
-        is_correct, is_valid, is_new = check_guess(game_id, duplicate_guess)
+        is_correct, is_valid, is_new = _evaluate_guess(game, duplicate_guess)
+        self.assertTrue(is_correct)
+        self.assertTrue(is_valid)
+        self.assertFalse(is_new)
+
+        # Test duplicate guess with the words reordered (still already guessed)
+        is_correct, is_valid, is_new = _evaluate_guess(game, duplicate_guess[::-1])
         self.assertTrue(is_correct)
         self.assertTrue(is_valid)
         self.assertFalse(is_new)
 
         # Test short guess (less than 4 words)
-        is_correct, is_valid, is_new = check_guess(game_id, short_guess)
+        is_correct, is_valid, is_new = _evaluate_guess(game, short_guess)
         self.assertFalse(is_correct)
         self.assertFalse(is_valid)
         self.assertTrue(is_new)
 
         # Test guess with a word not in the grid
-        is_correct, is_valid, is_new = check_guess(game_id, non_grid_word_guess)
+        is_correct, is_valid, is_new = _evaluate_guess(game, non_grid_word_guess)
         self.assertFalse(is_correct)
         self.assertFalse(is_valid)
         self.assertTrue(is_new)
@@ -255,8 +238,8 @@ class TestDAL(unittest.TestCase):
         self.assertFalse(game.connections[0]["guessed"])
         self.assertFalse(game.connections[1]["guessed"])
 
-    @patch("backend.src.dal.get_game_from_db")
-    @patch("backend.src.dal.db.session.commit")
+    @patch("backend.src.dal.dal.get_game_from_db")
+    @patch("backend.src.dal.dal.db.session.commit")
     def test_reset_game(self, mock_commit, mock_get_game_from_db):
         # Test to ensure that a game can be reset correctly.
         # This test checks if the game grid, connections, and previous guesses are reset, and mistakes are decremented.
@@ -273,4 +256,192 @@ class TestDAL(unittest.TestCase):
         )  # Check if connections are updated
         self.assertEqual(updated_game.previous_guesses, [])  # Check if previous guesses are cleared
         self.assertEqual(updated_game.mistakes_left, 4)  # Check if mistakes left are reset to 4
-        mock_commit.assert_called()  # Verify that changes are committed to the database
+        mock_commit.assert_called_once()  # Verify that changes are committed to the database
+
+
+class TestGetGameFromDb(unittest.TestCase):
+
+    def setUp(self):
+        # Loaded games only hold plain dictionaries when they come from a real database
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["TESTING"] = True
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        words = [f"word{i}" for i in range(16)]
+        connections = [
+            {"relationship": f"Group {i}", "guessed": False, "words": words[i * 4 : i * 4 + 4]}
+            for i in range(4)
+        ]
+        self.game_id = add_new_game(words, connections).id
+        # Drop the inserted object so the lookups below load the row from the database
+        db.session.expunge_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_get_game_from_db(self):
+        # By default the connections are left as the plain dictionaries loaded from JSON
+        game = get_game_from_db(self.game_id)
+        self.assertIsInstance(game, ConnectionsGame)
+        self.assertEqual(game.id, self.game_id)
+        self.assertIs(type(game.connections[0]), dict)
+
+    def test_get_game_from_db_mutable(self):
+        # With mutable=True the connections are wrapped for change tracking
+        game = get_game_from_db(self.game_id, mutable=True)
+        self.assertTrue(all(isinstance(c, MutableDict) for c in game.connections))
+
+    def test_get_game_from_db_returns_none(self):
+        # Test to ensure that None is returned when trying to retrieve a non-existing game.
+        self.assertIsNone(get_game_from_db("0123456789abcdef0123456789abcdef"))
+
+
+class TestApplyGuessConflict(unittest.TestCase):
+
+    def setUp(self):
+        # The concurrent write needs its own connection, so the database lives in a file
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{self.db_path}"
+        self.app.config["TESTING"] = True
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        words = [f"word{i}" for i in range(16)]
+        connections = [
+            {"relationship": f"Group {i}", "guessed": False, "words": words[i * 4 : i * 4 + 4]}
+            for i in range(4)
+        ]
+        self.game_id = add_new_game(words, connections).id
+        self.first_guess = [words[0], words[4], words[8], words[12]]
+        self.second_guess = [words[1], words[5], words[9], words[13]]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.ctx.pop()
+        os.remove(self.db_path)
+
+    def test_apply_guess_retries_after_concurrent_write(self):
+        # Another request records a guess between this request's read and its commit
+        calls = []
+
+        def evaluate_after_concurrent_guess(game, guess):
+            if not calls:
+                with Session(db.engine) as other:
+                    rival = other.get(ConnectionsGame, self.game_id)
+                    _record_guess(rival, self.first_guess, False)
+                    other.commit()
+            calls.append(guess)
+            return _evaluate_guess(game, guess)
+
+        with patch(
+            "backend.src.dal.dal._evaluate_guess", side_effect=evaluate_after_concurrent_guess
+        ):
+            game, is_correct, is_valid, is_new = apply_guess(self.game_id, self.second_guess)
+
+        # The first commit was rejected, and the retry evaluated the guess on the fresh state
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(is_valid)
+        self.assertFalse(is_correct)
+        self.assertTrue(is_new)
+
+        # Both guesses survive, instead of the later write overwriting the concurrent one
+        db.session.expire_all()
+        stored = db.session.get(ConnectionsGame, self.game_id)
+        self.assertEqual(stored.previous_guesses, [self.first_guess, self.second_guess])
+        self.assertEqual(stored.mistakes_left, 2)
+
+    def load_after_concurrent_guess(self, conflicts):
+        # Returns a get_game_from_db replacement for reset_game. For the first `conflicts` loads,
+        # another request records a guess after the load and before reset_game commits
+        loads = []
+
+        def load(game_id):
+            game = get_game_from_db(game_id)
+            if len(loads) < conflicts:
+                with Session(db.engine) as other:
+                    rival = other.get(ConnectionsGame, game_id)
+                    _record_guess(rival, [self.first_guess, self.second_guess][len(loads)], False)
+                    other.commit()
+            loads.append(game_id)
+            return game
+
+        return load, loads
+
+    def test_reset_game_retries_after_concurrent_write(self):
+        # The first commit is rejected, and the reset is applied again to the fresh row
+        load, loads = self.load_after_concurrent_guess(conflicts=1)
+        words = [f"new{i}" for i in range(16)]
+        with patch("backend.src.dal.dal.get_game_from_db", side_effect=load):
+            reset_game(self.game_id, words, [])
+        self.assertEqual(len(loads), 2)
+
+        # The reset wins over the concurrent guess instead of failing the request
+        db.session.expire_all()
+        stored = db.session.get(ConnectionsGame, self.game_id)
+        self.assertEqual(stored.grid, words)
+        self.assertEqual(stored.previous_guesses, [])
+        self.assertEqual(stored.mistakes_left, 4)
+
+    def test_reset_game_raises_after_exhausting_retries(self):
+        # If every attempt conflicts, the StaleDataError reaches the caller
+        load, loads = self.load_after_concurrent_guess(conflicts=2)
+        with patch("backend.src.dal.dal.get_game_from_db", side_effect=load):
+            with self.assertRaises(StaleDataError):
+                reset_game(self.game_id, [f"new{i}" for i in range(16)], [])
+        self.assertEqual(len(loads), 2)
+
+        # Both concurrent guesses are kept, and the failed reset wrote nothing
+        db.session.expire_all()
+        stored = db.session.get(ConnectionsGame, self.game_id)
+        self.assertEqual(stored.previous_guesses, [self.first_guess, self.second_guess])
+
+
+class TestGetAllGameStatesJson(unittest.TestCase):
+
+    def setUp(self):
+        # The states are aggregated by SQLite itself, so the games live in a real database
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        self.app.config["TESTING"] = True
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_get_all_game_states_json_empty(self):
+        # With no games the result is still a JSON object
+        self.assertEqual(json.loads(get_all_game_states_json()), {})
+
+    def test_get_all_game_states_json_matches_to_state(self):
+        # The aggregated JSON matches serializing each game's to_state() in Python
+        words = [f"word{i}" for i in range(16)]
+        connections = [
+            {"relationship": f"Group {i}", "guessed": False, "words": words[i * 4 : i * 4 + 4]}
+            for i in range(4)
+        ]
+        solved = [dict(connection, guessed=i == 1) for i, connection in enumerate(connections)]
+        games = add_new_games([(words, solved), (words[::-1], connections), (words, [])])
+        games[0].previous_guesses.append(words[4:8])
+        games[1].mistakes_left = 0
+        games[1].status = GameStatus.LOSS
+        db.session.commit()
+
+        expected = {game.id: game.to_state() for game in games}
+        self.assertEqual(json.loads(get_all_game_states_json()), expected)
@@ -1,15 +1,15 @@
 import unittest
-from unittest.mock import Mock, patch, mock_open
+from unittest.mock import MagicMock, patch
 from flask import Flask
 from backend.src.dal.dal import db
 from backend.src.game.game import (
+    _TEMPLATE_CONNECTIONS,
+    _TEMPLATE_GRID,
+    _is_well_formed_id,
     generate_game_grid,
     create_new_game,
-    get_all_games_data,
-    get_game_state,
     process_guess,
     restart_game,
-    validate_id,
 )
 from backend.src.models.models import ConnectionsGame
 
@@ -51,74 +51,61 @@ class TestGame(unittest.TestCase):
             },
         ]
         self.grid = [word for connection in self.connections for word in connection["words"]]
-
-    def test_validate_id_exists(self):
-        # This test checks if the validate_id function correctly identifies an existing game ID.
-        with patch("backend.src.game.check_game_exists", return_value=True):
-            self.assertTrue(validate_id(1))  # Test with an ID that exists
-
-    def test_validate_id_not_exists(self):
-        # This test checks if the validate_id function correctly identifies a non-existing game ID.
-        with patch("backend.src.game.check_game_exists", return_value=False):
-            self.assertFalse(validate_id(999))  # Test with an ID that does not exist
+        self.game_id = "0123456789abcdef0123456789abcdef"
 
     def test_generate_game_grid(self):
-        # This test verifies that the generate_game_grid function returns a grid and connections correctly.
-        with patch("backend.src.game.path.dirname", return_value="/fake/dir"):
-            with patch("backend.src.game.path.join", return_value="/fake/dir/connections.json"):
-                with patch(
-                    "builtins.open",
-                    mock_open(
-                        read_data='[{"words": ["apple", "banana"], "relationship": "fruits"}]'
-                    ),
-                ):
-                    with patch(
-                        "json.load",
-                        return_value=[{"words": ["apple", "banana"], "relationship": "fruits"}],
-                    ):
-                        with patch("random.shuffle", side_effect=lambda x: x.reverse()):
-                            grid, connections = generate_game_grid()
-                            self.assertEqual(
-                                grid, ["banana", "apple"]
-                            )  # Check if grid is correctly generated and shuffled
-                            self.assertEqual(
-                                connections,
-                                [{"words": ["apple", "banana"], "relationship": "fruits"}],
-                            )  # Check if connections are correctly loaded
+        # This test verifies that generate_game_grid shuffles the import-time template into a fresh grid
+        # and hands out connections that can be changed without touching the shared template.
+        with patch(
+            "backend.src.game.game.random.sample",
+            side_effect=lambda population, k: list(reversed(population)),
+        ) as mock_sample:
+            grid, connections = generate_game_grid()
+        mock_sample.assert_called_once_with(_TEMPLATE_GRID, 16)
+        self.assertEqual(grid, list(reversed(_TEMPLATE_GRID)))  # The sampled order is used as is
+        self.assertEqual(len(set(grid)), 16)  # 16 distinct words
+        self.assertEqual(set(grid), set(_TEMPLATE_GRID))  # All of them from the template
+
+        # Each connection is a fresh dict, so per-game changes leave the template unchanged
+        self.assertEqual(connections, [dict(c) for c in _TEMPLATE_CONNECTIONS])
+        template_guessed = _TEMPLATE_CONNECTIONS[0]["guessed"]
+        connections[0]["guessed"] = not template_guessed
+        connections[0]["relationship"] = "Changed"
+        self.assertEqual(_TEMPLATE_CONNECTIONS[0]["guessed"], template_guessed)
+        self.assertNotEqual(_TEMPLATE_CONNECTIONS[0]["relationship"], "Changed")
 
     def test_process_guess_correct_and_valid(self):
         # This test checks if the process_guess function correctly handles a valid and correct guess.
         correct_guess = ["apple", "banana", "cherry", "date"]
-        with patch("backend.src.game.check_guess", return_value=(True, True, True)):
-            with patch("backend.src.game.update_game_state"):
-                with patch(
-                    "backend.src.game.get_game_from_db", return_value={"game_state": "updated"}
-                ):
-                    game_state, is_valid, is_correct, is_new = process_guess(1, correct_guess)
-                    self.assertTrue(is_valid)
-                    self.assertTrue(is_correct)
-                    self.assertTrue(is_new)
-                    self.assertEqual(game_state, {"game_state": "updated"})
+        game = MagicMock()
+        with patch(
+            "backend.src.game.game.apply_guess", return_value=(game, True, True, True)
+        ) as mock_apply_guess:
+            game_state, is_valid, is_correct, is_new = process_guess(self.game_id, correct_guess)
+            mock_apply_guess.assert_called_once_with(self.game_id, correct_guess)
+            self.assertTrue(is_valid)
+            self.assertTrue(is_correct)
+            self.assertTrue(is_new)
+            self.assertIs(game_state, game)
 
     def test_process_guess_incorrect_but_valid(self):
         # This test checks if the process_guess function correctly handles a valid but incorrect guess.
-        incorrect_guess = ["whale", "coral", "shark", "dolphin"]
-        with patch("backend.src.game.check_guess", return_value=(False, True, True)):
-            with patch("backend.src.game.update_game_state"):
-                with patch(
-                    "backend.src.game.get_game_from_db", return_value={"game_state": "updated"}
-                ):
-                    game_state, is_valid, is_correct, is_new = process_guess(1, incorrect_guess)
-                    self.assertTrue(is_valid)
-                    self.assertFalse(is_correct)
-                    self.assertTrue(is_new)
-                    self.assertEqual(game_state, {"game_state": "updated"})
+        incorrect_guess = ["apple", "coral", "shark", "dolphin"]
+        game = MagicMock()
+        with patch("backend.src.game.game.apply_guess", return_value=(game, False, True, True)):
+            game_state, is_valid, is_correct, is_new = process_guess(self.game_id, incorrect_guess)
+            self.assertTrue(is_valid)
+            self.assertFalse(is_correct)
+            self.assertTrue(is_new)
+            self.assertIs(game_state, game)
 
     def test_process_guess_invalid(self):
         # This test checks if the process_guess function correctly handles an invalid guess.
         invalid_guess = ["guitar", "piano", "violin", "violin"]  # Duplicate word makes it invalid
-        with patch("backend.src.game.check_guess", return_value=(False, False, True)):
-            game_state, is_valid, is_correct, is_new = process_guess(1, invalid_guess)
+        with patch(
+            "backend.src.game.game.apply_guess", return_value=(MagicMock(), False, False, True)
+        ):
+            game_state, is_valid, is_correct, is_new = process_guess(self.game_id, invalid_guess)
             self.assertFalse(is_valid)
             self.assertFalse(is_correct)
             self.assertTrue(is_new)
@@ -126,134 +113,108 @@ class TestGame(unittest.TestCase):
 
     def test_process_guess_new_and_not_new(self):
         # This test checks if the process_guess function correctly identifies new and not new guesses.
-        game_id = 1
-        new_guess = ["apple", "banana", "cherry", "date"]
-        not_new_guess = ["apple", "banana", "cherry", "date"]
-
-        # Mock the game state to include the not new guess in previous guesses
-        game_state_with_previous = {"game_state": "updated", "previous_guesses": [not_new_guess]}
+        guess = ["apple", "banana", "cherry", "date"]
+        game = MagicMock()
 
         with patch(
-            "backend.src.game.check_guess",
+            "backend.src.game.game.apply_guess",
             side_effect=[
-                (True, True, True),  # First call for new guess
-                (True, True, False),  # Second call for not new guess
+                (game, True, True, True),  # First call for new guess
+                (game, True, True, False),  # Second call for the same guess again
             ],
         ):
-            with patch("backend.src.game.update_game_state"):
-                with patch(
-                    "backend.src.game.get_game_from_db",
-                    side_effect=[game_state_with_previous, game_state_with_previous],
-                ):
-                    # Test with new guess
-                    state_new, is_valid_new, is_correct_new, is_new_new = process_guess(
-                        game_id, new_guess
-                    )
-                    self.assertTrue(is_new_new)
-                    self.assertTrue(is_valid_new)
-                    self.assertTrue(is_correct_new)
-                    self.assertEqual(state_new, game_state_with_previous)
-
-                    # Test with not new guess
-                    state_not_new, is_valid_not_new, is_correct_not_new, is_new_not_new = (
-                        process_guess(game_id, not_new_guess)
-                    )
-                    self.assertFalse(is_new_not_new)
-                    self.assertTrue(is_valid_not_new)
-                    self.assertTrue(is_correct_not_new)
-                    self.assertEqual(state_not_new, game_state_with_previous)
+            # Test with new guess
+            state_new, is_valid_new, is_correct_new, is_new_new = process_guess(self.game_id, guess)
+            self.assertTrue(is_new_new)
+            self.assertTrue(is_valid_new)
+            self.assertTrue(is_correct_new)
+            self.assertIs(state_new, game)
+
+            # Test with not new guess
+            state_not_new, is_valid_not_new, is_correct_not_new, is_new_not_new = process_guess(
+                self.game_id, guess
+            )
+            self.assertFalse(is_new_not_new)
+            self.assertTrue(is_valid_not_new)
+            self.assertTrue(is_correct_not_new)
+            self.assertIs(state_not_new, game)
+
+    def test_process_guess_malformed_id(self):
+        # This test checks that a malformed game ID is rejected before the database is queried.
+        with patch("backend.src.game.game.apply_guess") as mock_apply_guess:
+            with self.assertRaises(ValueError):
+                process_guess("not-a-game-id", ["apple", "banana", "cherry", "date"])
+            mock_apply_guess.assert_not_called()
 
     def test_create_new_game(self):
         # This test checks if a new game is created successfully with the correct game grid and connections.
         expected_grid = self.grid
         expected_connections = self.connections
         with patch(
-            "backend.src.game.generate_game_grid",
+            "backend.src.game.game.generate_game_grid",
             return_value=(expected_grid, expected_connections),
         ):
-            with patch("backend.src.game.add_new_game", return_value=1):
-                with patch(
-                    "backend.src.game.get_game_from_db",
-                    return_value=ConnectionsGame(
-                        id=1,
-                        grid=expected_grid,
-                        connections=expected_connections,
-                    ),
-                ):
-                    game_state = create_new_game()
-                    self.assertEqual(game_state.id, 1)
-                    self.assertEqual(game_state.grid, expected_grid)
-                    self.assertEqual(game_state.connections, expected_connections)
-
-    def test_get_game_state_exists(self):
-        # This test checks if the get_game_state function retrieves the correct game state when the game exists.
-        game_id = 1
-        expected_game_state = {"game_id": game_id, "grid": ["word1", "word2"], "connections": {}}
-        with patch("backend.src.game.get_game_from_db", return_value=expected_game_state):
-            game_state = get_game_state(game_id)
-            self.assertEqual(game_state, expected_game_state)
-
-    def test_get_game_state_not_exists(self):
-        # This test checks if the get_game_state function raises a ValueError when the game does not exist.
-        game_id = 999
-        with patch("backend.src.game.get_game_from_db", return_value=None):
-            with self.assertRaises(ValueError):
-                get_game_state(game_id)
+            with patch(
+                "backend.src.game.game.add_new_game",
+                return_value=ConnectionsGame(
+                    id=1,
+                    grid=expected_grid,
+                    connections=expected_connections,
+                ),
+            ):
+                game_state = create_new_game()
+                self.assertEqual(game_state.id, 1)
+                self.assertEqual(game_state.grid, expected_grid)
+                self.assertEqual(game_state.connections, expected_connections)
 
     def test_restart_game_exists(self):
         # This test checks if an existing game can be restarted successfully.
-        # It mocks the game existence check, grid generation, and game reset.
-        with patch("backend.src.game.check_game_exists", return_value=True):
-            with patch(
-                "backend.src.game.generate_game_grid",
-                return_value=(["word1", "word2"], {("word1", "word2"): "relationship"}),
-            ):
-                with patch("backend.src.game.reset_game", return_value=True):
-                    self.assertTrue(restart_game(1))  # Assert the game restarts successfully
+        # It mocks the grid generation and the game reset.
+        game = MagicMock()
+        with patch(
+            "backend.src.game.game.generate_game_grid",
+            return_value=(self.grid, self.connections),
+        ):
+            with patch("backend.src.game.game.reset_game", return_value=game) as mock_reset_game:
+                self.assertIs(restart_game(self.game_id), game)  # The reset game is returned
+                mock_reset_game.assert_called_once_with(self.game_id, self.grid, self.connections)
 
     def test_restart_game_not_exists(self):
         # This test ensures that attempting to restart a non-existent game raises a ValueError.
-        with self.app.app_context():
-            with patch("backend.src.game.check_game_exists", return_value=False):
-                with self.assertRaises(ValueError) as context:
-                    restart_game(999)
-                self.assertEqual(
-                    str(context.exception), "No game found with the provided ID: 999"
-                )  # Check the error message
-
-    def test_get_all_games_data(self):
-        # This test checks if the get_all_games_data function retrieves all games data correctly
-        # using predefined connections and grid.
-        mock_games = [
-            Mock(
-                id=1,
-                to_state=lambda: {
-                    "game_id": 1,
-                    "grid": self.grid[:2],
-                    "connections": self.connections[0],
-                },
-            ),
-            Mock(
-                id=2,
-                to_state=lambda: {
-                    "game_id": 2,
-                    "grid": self.grid[2:4],
-                    "connections": self.connections[1],
-                },
-            ),
-        ]
-        with patch("backend.src.game.get_all_games", return_value=mock_games):
-            all_games_data = get_all_games_data()
-            expected_data = {
-                1: {
-                    "game_id": 1,
-                    "grid": self.grid[:2],
-                    "connections": self.connections[0],
-                },
-                2: {
-                    "game_id": 2,
-                    "grid": self.grid[2:4],
-                    "connections": self.connections[1],
-                },
-            }
-            self.assertEqual(all_games_data, expected_data)
+        error = ValueError(f"No game found with the provided ID: {self.game_id}")
+        with patch("backend.src.game.game.reset_game", side_effect=error):
+            with self.assertRaises(ValueError) as context:
+                restart_game(self.game_id)
+            self.assertIs(context.exception, error)
+
+    def test_restart_game_malformed_id(self):
+        # This test ensures that a malformed game ID is rejected without resetting anything.
+        with patch("backend.src.game.game.reset_game") as mock_reset_game:
+            with self.assertRaises(ValueError) as context:
+                restart_game(999)
+            self.assertEqual(
+                str(context.exception), "No game found with the provided ID: 999"
+            )  # Check the error message
+            mock_reset_game.assert_not_called()
+
+    def test_is_well_formed_id_accepts_uuids(self):
+        # This test checks that both the hex and the canonical dashed UUID forms are accepted.
+        self.assertTrue(_is_well_formed_id("0123456789abcdef0123456789abcdef"))
+        self.assertTrue(_is_well_formed_id("01234567-89ab-cdef-0123-456789abcdef"))
+        self.assertTrue(_is_well_formed_id("01234567-89AB-CDEF-0123-456789ABCDEF"))
+
+    def test_is_well_formed_id_rejects_malformed_ids(self):
+        # This test checks that mixed dash forms, wrong lengths and non-strings are rejected.
+        for game_id in (
+            "01234567-89abcdef0123456789abcdef",  # Only some of the dashes
+            "0123456789ab-cdef-0123-456789abcdef",  # Dashes in the wrong places
+            "0123456789abcdef0123456789abcde",  # One character short
+            "0123456789abcdef0123456789abcdef0",  # One character long
+            "0123456789abcdef0123456789abcdef\n",  # Trailing newline
+            "0123456789abcdef0123456789abcdeg",  # Not hexadecimal
+            "",
+            None,
+            1,
+        ):
+            with self.subTest(game_id=game_id):
+                self.assertFalse(_is_well_formed_id(game_id))
@@ -1,5 +1,11 @@
 import { useState, useEffect } from "react";
 
+/**
+ * The last game status received for each game, with the ETag it was served with.
+ * Kept outside the hook so the status survives remounts and can be revalidated.
+ */
+const gameStatusCache = new Map<string, { etag: string; grid: string[] }>();
+
 /**
  * Custom hook to manage the game grid state.
  * Fetches the game grid data from the server and handles loading and error states.
@@ -23,19 +29,24 @@ const useGameGrid = () => {
      */
     const fetchGameGrid = async () => {
       try {
-        // Send a POST request to the server to fetch the game grid data
+        const gameId = "64cbc900-bd56-4cfa-9ece-eaaae6f2d03f";
+        const cached = gameStatusCache.get(gameId);
+        // Send a GET request to the server to fetch the game grid data, revalidating the
+        // last status received so an unchanged game is answered with an empty 304
         const response = await fetch(
-          "http://localhost:5000/connections/game-status",
+          `http://localhost:5000/connections/game-status?gameId=${encodeURIComponent(gameId)}`,
           {
-            method: "POST",
-            headers: {
-              "Content-Type": "application/json",
-            },
-            body: JSON.stringify({
-              gameId: "64cbc900-bd56-4cfa-9ece-eaaae6f2d03f",
-            }),
+            method: "GET",
+            headers: cached ? { "If-None-Match": cached.etag } : {},
+            // The ETag is tracked here, so the browser cache must not answer on its own
+            cache: "no-store",
           }
         );
+        if (response.status === 304 && cached) {
+          // The game has not changed since the last fetch, so reuse its grid
+          setWords(cached.grid);
+          return;
+        }
         // Parse the JSON response from the server
         const jsonResponse = await response.json();
         const data = jsonResponse.data;
@@ -43,6 +54,10 @@ const useGameGrid = () => {
         if (response.ok) {
           // If the response is successful, update the words state with the fetched data
           setWords(data.grid);
+          const etag = response.headers.get("ETag");
+          if (etag) {
+            gameStatusCache.set(gameId, { etag, grid: data.grid });
+          }
         } else {
           // If the response is not successful, update the error state with the error message
           setError(data.error || "Failed to fetch game grid");